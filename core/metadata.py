@@ -1,6 +1,8 @@
 import piexif
 from PIL import Image, PngImagePlugin
 import os
+import re
+import datetime
 import logging
 
 ENABLE_METADATA_LOGGING = False
@@ -17,6 +19,8 @@ else:
     logger.addHandler(logging.NullHandler())
     logger.propagate = False
 
+_EXIF_DATE_RE = re.compile(r"(\d{4}):(\d{2}):(\d{2})")
+
 def _is_jpeg_tiff(path):
     ext = os.path.splitext(path)[1].lower()
     return ext in (".jpg", ".jpeg", ".tif", ".tiff")
@@ -27,39 +31,60 @@ def _is_png(path):
 def _is_webp(path):
     return os.path.splitext(path)[1].lower() == ".webp"
 
+def _exif_date(exif_dict):
+    for ifd, tag in (("Exif", piexif.ExifIFD.DateTimeOriginal), ("0th", piexif.ImageIFD.DateTime)):
+        value = exif_dict.get(ifd, {}).get(tag)
+        if value:
+            # EXIF dates look like b"2024:05:12 10:30:00"
+            m = _EXIF_DATE_RE.match(value.decode("ascii", errors="replace"))
+            if not m:
+                continue
+            try:
+                # Cameras with an unset clock write "0000:00:00 00:00:00"
+                return datetime.date(*map(int, m.groups())).isoformat()
+            except ValueError:
+                continue
+    return ""
+
 def read_comment(image_path):
+    return read_metadata(image_path)[0]
+
+# Comment and EXIF capture date ("YYYY-MM-DD", or "" when unknown) from a single read of the file.
+def read_metadata(image_path):
+    date = ""
     try:
         if _is_jpeg_tiff(image_path):
             exif_dict = piexif.load(image_path)
+            date = _exif_date(exif_dict)
             user_comment = exif_dict["Exif"].get(piexif.ExifIFD.UserComment)
             if user_comment:
                 if user_comment.startswith(b"ASCII\0\0\0"):
                     user_comment = user_comment[8:]
                 comment = user_comment.decode("utf-8", errors="replace").strip()
                 logger.info(f"Read UserComment from {image_path}: {comment}")
-                return comment
+                return comment, date
             img_desc = exif_dict["0th"].get(piexif.ImageIFD.ImageDescription)
             if img_desc:
                 comment = img_desc.decode("utf-8", errors="replace").strip()
                 logger.info(f"Read ImageDescription from {image_path}: {comment}")
-                return comment
+                return comment, date
         elif _is_png(image_path):
             with Image.open(image_path) as im:
                 meta = im.info
                 for key in ("Description", "Comment", "ImageDescription"):
                     if key in meta:
                         logger.info(f"Read {key} from {image_path}: {meta[key]}")
-                        return meta[key]
+                        return meta[key], date
         elif _is_webp(image_path):
             with Image.open(image_path) as im:
                 meta = im.info
                 for key in ("description", "Comment", "ImageDescription"):
                     if key in meta:
                         logger.info(f"Read {key} from {image_path}: {meta[key]}")
-                        return meta[key]
+                        return meta[key], date
     except Exception as e:
         logger.error(f"Error reading metadata from {image_path}: {e}")
-    return ""
+    return "", date
 
 def write_comment(image_path, comment):
     try:
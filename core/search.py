@@ -0,0 +1,447 @@
+import os
+import re
+import html
+import datetime
+from functools import lru_cache
+from core.metadata import read_metadata
+
+# Query syntax:
+#   cat dog            both words (implicit AND)
+#   cat OR dog         either word
+#   NOT cat, -cat      exclude
+#   "black cat"        exact phrase
+#   (cat OR dog) sea   grouping
+#   /ca+t/             regular expression on the comment
+#   ext:jpg            file extension
+#   folder:trips       sub-folder (relative to the scanned folder) containing the text
+#   date:2024-05       capture date prefix; date:2024-01..2024-03 for a range
+#   has:comment        files that have a comment
+# The capture date is EXIF DateTimeOriginal/DateTime, or the file's modification date
+# when the file has none.
+# Matching is case-insensitive, but the operators AND, OR and NOT must be uppercase;
+# lowercase "and", "or", "not" are searched as ordinary words.
+
+FIELDS = ("ext", "folder", "date", "has")
+
+_WORD_RE = re.compile(r"\w+")
+_TOKEN_RE = re.compile(
+    r'\s*(?:'
+    r'(?P<lparen>\()|(?P<rparen>\))'
+    r'|(?P<neg>-)(?=[^\s-])'
+    r'|(?P<regex>/(?:\\.|[^/\\])*/)'
+    r'|(?P<field>[A-Za-z]+):(?:"(?P<fquoted>[^"]*)"?|(?P<fvalue>[^\s()"]*))'
+    r'|"(?P<phrase>[^"]*)"?'
+    r'|(?P<word>[^\s()"]+)'
+    r')'
+)
+
+_DATE_VALUE_RE = re.compile(r"\d{4}(-\d{2}(-\d{2})?)?")
+
+HIGHLIGHT_STYLE = "background-color: #ffe066;"
+
+
+class QueryError(ValueError):
+    pass
+
+
+class SearchIndex:
+    """
+    Column store of everything a query can filter on, built once per folder.
+    Rows are positions in `paths`; every lookup returns a set of row numbers.
+    """
+
+    def __init__(self, paths, root=None, metadata_reader=read_metadata):
+        self.paths = list(paths)
+        self.root = root
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        self.all_rows = frozenset(range(len(self.paths)))
+        self.comments = []
+        self.comments_lower = []
+        self.by_word = {}     # word -> rows whose comment contains it
+        self.by_ext = {}      # "jpg" -> rows
+        self.by_folder = {}   # relative folder (lowercase, "/" separated) -> rows
+        self.by_date = {}     # "YYYY-MM-DD" -> rows
+        self.dates = []
+        self.mtime_dated = set()  # rows without an EXIF date, dated by modification time
+        self.commented = set()
+
+        for row, path in enumerate(self.paths):
+            try:
+                comment, date = metadata_reader(path)
+            except Exception:
+                comment, date = None, ""
+            self.comments.append("")
+            self.comments_lower.append("")
+            self._set_comment(row, comment or "")
+
+            ext = os.path.splitext(path)[1].lower().lstrip(".")
+            self.by_ext.setdefault(ext, set()).add(row)
+
+            folder = os.path.dirname(path)
+            if root:
+                folder = os.path.relpath(folder, root)
+                if folder == ".":
+                    folder = ""
+            folder = folder.replace(os.sep, "/").lower()
+            self.by_folder.setdefault(folder, set()).add(row)
+
+            self.dates.append("")
+            if not date:
+                self.mtime_dated.add(row)
+                date = _mtime_date(path)
+            self._set_date(row, date)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def comment(self, path):
+        row = self.rows.get(path)
+        return self.comments[row] if row is not None else ""
+
+    def update_comment(self, path, comment):
+        row = self.rows.get(path)
+        if row is not None:
+            self._set_comment(row, comment or "")
+            if row in self.mtime_dated:
+                # Saving a comment rewrites the file, which moves its modification date.
+                self._set_date(row, _mtime_date(path))
+
+    def _set_date(self, row, date):
+        rows = self.by_date.get(self.dates[row])
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del self.by_date[self.dates[row]]
+        self.dates[row] = date
+        self.by_date.setdefault(date, set()).add(row)
+
+    def _set_comment(self, row, comment):
+        for word in set(_WORD_RE.findall(self.comments_lower[row])):
+            rows = self.by_word.get(word)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self.by_word[word]
+        self.comments[row] = comment
+        lower = comment.lower()
+        self.comments_lower[row] = lower
+        for word in set(_WORD_RE.findall(lower)):
+            self.by_word.setdefault(word, set()).add(row)
+        if comment.strip():
+            self.commented.add(row)
+        else:
+            self.commented.discard(row)
+
+    def rows_with_word_part(self, part):
+        """Rows with a word containing `part` (a lowercase run of word characters)."""
+        # A run of word characters can only occur inside a single word,
+        # so scanning the vocabulary is enough.
+        rows = set()
+        for word, word_rows in self.by_word.items():
+            if part in word:
+                rows |= word_rows
+        return rows
+
+    def rows_containing(self, text, candidates=None):
+        """Rows (of `candidates`, if given) whose comment contains `text` (already lowercased)."""
+        if _WORD_RE.fullmatch(text):
+            rows = self.rows_with_word_part(text)
+            return rows & candidates if candidates is not None else rows
+        # Narrow to rows holding every word run of the text, then check the substring.
+        # Runs with a non-word character on both sides must be whole words; runs at
+        # either end may be part of a longer word.
+        lookups = []
+        for m in _WORD_RE.finditer(text):
+            whole = m.start() > 0 and m.end() < len(text)
+            lookups.append((not whole, m.group(0)))
+        rows = candidates
+        for partial, run in sorted(lookups):
+            found = self.rows_with_word_part(run) if partial else self.by_word.get(run, set())
+            rows = found & rows if rows is not None else set(found)
+            if not rows:
+                return set()
+        if rows is None:
+            rows = self.all_rows
+        return {row for row in rows if text in self.comments_lower[row]}
+
+    def rows_matching(self, regex, candidates=None):
+        rows = self.all_rows if candidates is None else candidates
+        return {row for row in rows if regex.search(self.comments[row])}
+
+
+def _mtime_date(path):
+    try:
+        return datetime.date.fromtimestamp(os.path.getmtime(path)).isoformat()
+    except OSError:
+        return ""
+
+
+# Compiled plan nodes. Each evaluates to the set of rows of a SearchIndex that match,
+# restricted to `candidates` when the caller has already narrowed them down.
+
+class MatchAll:
+    def evaluate(self, index, candidates=None):
+        return set(index.all_rows if candidates is None else candidates)
+
+
+class Text:
+    def __init__(self, text):
+        self.text = text.lower()
+
+    def evaluate(self, index, candidates=None):
+        return index.rows_containing(self.text, candidates)
+
+
+class Regex:
+    def __init__(self, pattern):
+        try:
+            self.regex = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise QueryError(f"Invalid regular expression /{pattern}/: {e}")
+
+    def evaluate(self, index, candidates=None):
+        return index.rows_matching(self.regex, candidates)
+
+
+class Field:
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value.lower()
+        if name == "ext":
+            self.value = self.value.lstrip(".")
+        elif name == "has" and self.value != "comment":
+            raise QueryError(f"Unknown has: value '{value}' (expected has:comment)")
+        elif name == "date":
+            start, sep, end = self.value.partition("..")
+            self.date_range = (start, end) if sep else None
+            endpoints = [d for d in (start, end) if d] if sep else [self.value]
+            if not endpoints or not all(_DATE_VALUE_RE.fullmatch(d) for d in endpoints):
+                raise QueryError(f"Invalid date '{value}' (expected YYYY, YYYY-MM or YYYY-MM-DD, or a range A..B)")
+            n = min(len(start), len(end))
+            if sep and start and end and start[:n] > end[:n]:
+                raise QueryError(f"Invalid date range '{value}' (end is before start)")
+
+    def evaluate(self, index, candidates=None):
+        rows = self._lookup(index)
+        return rows & candidates if candidates is not None else rows
+
+    def _lookup(self, index):
+        if self.name == "ext":
+            return set(index.by_ext.get(self.value, ()))
+        if self.name == "has":
+            return set(index.commented)
+        if self.name == "folder":
+            return _union(rows for folder, rows in index.by_folder.items() if self.value in folder)
+        return _union(rows for date, rows in index.by_date.items() if date and self._date_matches(date))
+
+    def _date_matches(self, date):
+        if self.date_range is None:
+            return date.startswith(self.value)
+        start, end = self.date_range
+        # Compare on prefixes so "2024-01..2024-03" includes all of March.
+        return (not start or date[:len(start)] >= start) and (not end or date[:len(end)] <= end)
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def evaluate(self, index, candidates=None):
+        rows = set(index.all_rows if candidates is None else candidates)
+        return rows - self.child.evaluate(index, rows)
+
+
+class And:
+    def __init__(self, children):
+        # Cheap indexed lookups first; each later child only checks the rows left over.
+        self.children = sorted(children, key=_cost)
+
+    def evaluate(self, index, candidates=None):
+        rows = candidates
+        for child in self.children:
+            rows = child.evaluate(index, rows)
+            if not rows:
+                break
+        return rows
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+
+    def evaluate(self, index, candidates=None):
+        return _union(child.evaluate(index, candidates) for child in self.children)
+
+
+def _union(sets):
+    rows = set()
+    for s in sets:
+        rows |= s
+    return rows
+
+
+def _cost(node):
+    if isinstance(node, (Field, MatchAll)):
+        return 0
+    if isinstance(node, Text):
+        return 1
+    if isinstance(node, Regex):
+        return 3
+    if isinstance(node, Not):
+        return _cost(node.child)
+    return max(_cost(child) for child in node.children)
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = list(_tokenize(text))
+        self.pos = 0
+        self.highlights = []
+        self.negated = False
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return MatchAll()
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise QueryError("Unexpected ')'")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == ("op", "OR"):
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while True:
+            kind, value = self.peek()
+            if kind == "op" and value == "AND":
+                self.take()
+            elif kind is None or kind == "rparen" or (kind == "op" and value == "OR"):
+                break
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_not(self):
+        if self.peek() == ("op", "NOT"):
+            self.take()
+            # Parity, not depth: NOT NOT cat is a positive match on cat.
+            self.negated ^= True
+            node = Not(self.parse_not())
+            self.negated ^= True
+            return node
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, value = self.take()
+        if kind == "lparen":
+            node = self.parse_or()
+            if self.take()[0] != "rparen":
+                raise QueryError("Missing ')'")
+            return node
+        if kind is None:
+            raise QueryError("Query ends unexpectedly")
+        if kind in ("rparen", "op"):
+            raise QueryError(f"Unexpected '{value}'")
+        if kind == "field":
+            return Field(*value)
+        if kind == "regex":
+            node = Regex(value)
+            if not self.negated:
+                self.highlights.append(node.regex)
+            return node
+        if not value:
+            return MatchAll()
+        if not self.negated:
+            self.highlights.append(re.compile(re.escape(value), re.IGNORECASE))
+        return Text(value)
+
+
+def _tokenize(text):
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        pos = m.end()
+        if m.group("lparen"):
+            yield ("lparen", "(")
+        elif m.group("rparen"):
+            yield ("rparen", ")")
+        elif m.group("neg"):
+            yield ("op", "NOT")
+        elif m.group("regex"):
+            yield ("regex", m.group("regex")[1:-1])
+        elif m.group("field") is not None and m.group("field").lower() in FIELDS:
+            value = m.group("fquoted") if m.group("fquoted") is not None else m.group("fvalue")
+            if not value:
+                raise QueryError(f"Missing value for {m.group('field')}:")
+            yield ("field", (m.group("field").lower(), value))
+        elif m.group("field") is not None:
+            # Not a known qualifier, e.g. "note:" or "http://..." - search it as text.
+            yield ("word", m.group(0).strip())
+        elif m.group("phrase") is not None:
+            yield ("phrase", m.group("phrase"))
+        else:
+            word = m.group("word")
+            if word in ("AND", "OR", "NOT"):
+                yield ("op", word)
+            else:
+                yield ("word", word)
+
+
+class Query:
+    """A parsed search query: a plan to run against a SearchIndex plus a highlighter."""
+
+    def __init__(self, text):
+        self.text = text
+        parser = _Parser(text)
+        self.plan = parser.parse()
+        self.highlight_regexes = parser.highlights
+
+    def filter(self, index):
+        """Matching paths of the index, in index order."""
+        rows = self.plan.evaluate(index)
+        return [index.paths[row] for row in sorted(rows)]
+
+    def highlight(self, text):
+        """HTML-escaped `text` with the query's positive terms highlighted."""
+        if not text:
+            return ""
+        parts = []
+        last = 0
+        for start, end in _merge_spans(
+            m.span() for regex in self.highlight_regexes for m in regex.finditer(text) if m.end() > m.start()
+        ):
+            parts.append(html.escape(text[last:start]))
+            parts.append(f"<span style='{HIGHLIGHT_STYLE}'>{html.escape(text[start:end])}</span>")
+            last = end
+        parts.append(html.escape(text[last:]))
+        return "".join(parts)
+
+
+def _merge_spans(spans):
+    # Each pattern is matched on its own, so spans from different terms may overlap.
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+@lru_cache(maxsize=64)
+def compile_query(text):
+    """Parse `text` once; repeated calls with the same text reuse the plan."""
+    return Query(text.strip())
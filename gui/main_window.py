@@ -10,13 +10,13 @@ from PySide6.QtGui import QPixmap, QGuiApplication, QImageReader, QImage
 from .comment_editor import CommentEditor
 from core.file_scanner import scan_images
 from core.metadata import read_comment
+from core.search import SearchIndex, QueryError, compile_query
 import os
 import platform
 import subprocess
 import hashlib
 import pathlib
 import html
-import re
 
 ENABLE_UI_LOGGING = False
 
@@ -38,18 +38,6 @@ MAX_COLS = 6
 THUMB_SIZE = 128
 SPACING = 12
 
-def highlight_text(text: str, query: str) -> str:
-    if not text or not query:
-        return html.escape(text or "")
-
-    escaped = html.escape(text)
-    pattern = re.compile(re.escape(query), re.IGNORECASE)
-
-    return pattern.sub(
-        lambda m: f"<span style='background-color: #ffe066;'>{m.group(0)}</span>",
-        escaped
-    )
-
 def open_in_explorer(path):
     """Open a file in Finder/Explorer/your file manager."""
     system = platform.system()
@@ -107,7 +95,7 @@ class ThumbnailWorker(QRunnable):
             logger.exception(f"ThumbnailWorker failed for {self.path}: {e}")
 
 class ImageGridItem(QFrame):
-    def __init__(self, image_path, show_note, click_callback, search_text="", parent=None):
+    def __init__(self, image_path, show_note, click_callback, comment="", query=None, parent=None):
         super().__init__(parent)
         logger.debug(f"Creating ImageGridItem for {image_path}, show_note={show_note}")
         self.image_path = image_path
@@ -127,12 +115,7 @@ class ImageGridItem(QFrame):
         self.layout.addWidget(self.name)
 
         if show_note:
-            # read_comment can be expensive; but leaving for now
-            try:
-                comment = read_comment(self.image_path)
-            except Exception:
-                comment = None
-            self.note.setText(highlight_text(comment or "", search_text))
+            self.note.setText(query.highlight(comment) if query else html.escape(comment))
             self.note.setWordWrap(True)
             self.note.setAlignment(Qt.AlignCenter)
             self.note.setStyleSheet("font-size: 11px; color: #555;")
@@ -148,10 +131,9 @@ class ImageGridItem(QFrame):
             scaled = pixmap.scaled(THUMB_SIZE, THUMB_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             self.thumb.setPixmap(scaled)
 
-    def refresh_note(self, show_note, search_text=""):
+    def refresh_note(self, show_note, comment="", query=None):
         if show_note:
-            comment = read_comment(self.image_path)
-            self.note.setText(highlight_text(comment or "", search_text))
+            self.note.setText(query.highlight(comment) if query else html.escape(comment))
             self.note.setHidden(False)
         else:
             self.note.setHidden(True)
@@ -183,8 +165,8 @@ class MainWindow(QMainWindow):
         # Search and notes toggle
         search_toggle_layout = QHBoxLayout()
         self.search_box = QLineEdit()
-        self.search_box.setPlaceholderText("Search by comment...")
-        self.search_box.textChanged.connect(self.refresh_grid)
+        self.search_box.setPlaceholderText('Search by comment... e.g. "black cat" OR dog ext:jpg -has:comment')
+        self.search_box.textChanged.connect(self.on_search_changed)
         self.notes_toggle = QCheckBox("Show notes")
         self.notes_toggle.setChecked(True)
         self.notes_toggle.stateChanged.connect(self.on_notes_toggle)
@@ -231,6 +213,8 @@ class MainWindow(QMainWindow):
 
         # image state
         self.images = []
+        self.index = SearchIndex([])
+        self.query = compile_query("")
         self.filtered_images = []
         self.current_folder = None
         self.selected_image = None
@@ -305,6 +289,8 @@ class MainWindow(QMainWindow):
             self.current_folder = folder
             self.folder_label.setText(folder)
             self.images = scan_images(folder)
+            # Comments are read once here; searching only queries the index.
+            self.index = SearchIndex(self.images, root=folder)
             self.loaded_count = 0
             self.preloaded_count = 0
             # clear thumbnail cache for changed folder? We'll keep cache but it's keyed by full path.
@@ -314,19 +300,25 @@ class MainWindow(QMainWindow):
         logger.debug(f"Notes toggle: {state}. Refreshing grid.")
         self.refresh_grid()
 
+    def on_search_changed(self, text):
+        try:
+            query = compile_query(text.strip())
+        except QueryError as e:
+            # Partial queries like "cat OR" or "(cat" show up while typing;
+            # keep the last valid results instead of rebuilding the grid.
+            logger.debug(f"Invalid query '{text}': {e}")
+            self.search_box.setStyleSheet("border: 1px solid #d9534f;")
+            self.search_box.setToolTip(str(e))
+            return
+        self.search_box.setStyleSheet("")
+        self.search_box.setToolTip("")
+        self.query = query
+        self.refresh_grid()
+
     def refresh_grid(self):
-        text = self.search_box.text().strip().lower()
         show_note = self.notes_toggle.isChecked()
-        logger.debug(f"Refreshing grid. Search text: '{text}' show_note state: {show_note}")
-        # Filter images (note: read_comment may be slow for many images; consider moving filtering to a background thread if that's an issue)
-        self.filtered_images = []
-        for path in self.images:
-            try:
-                comment = read_comment(path)
-            except Exception:
-                comment = None
-            if not text or (comment and text in comment.lower()):
-                self.filtered_images.append(path)
+        logger.debug(f"Refreshing grid. Query: '{self.query.text}' show_note state: {show_note}")
+        self.filtered_images = self.query.filter(self.index)
         # Properly delete widgets to prevent them from becoming windows
         for i in reversed(range(self.grid_layout.count())):
             widget = self.grid_layout.itemAt(i).widget()
@@ -398,7 +390,6 @@ class MainWindow(QMainWindow):
     def load_more_images(self, preload=False):
         logger.debug(f"Loading more images, preload={preload}")
         show_note = self.notes_toggle.isChecked()
-        search_text = self.search_box.text().strip()
         cols = self.cols
         total = len(self.filtered_images)
         batch_size = self.batch_size
@@ -425,7 +416,8 @@ class MainWindow(QMainWindow):
         end = min(start + batch_size, total)
         for idx, path in enumerate(self.filtered_images[start:end], start=start):
             row, col = divmod(idx, cols)
-            item = ImageGridItem(path, show_note, self.on_image_selected, search_text=search_text, parent=self.grid_widget)
+            item = ImageGridItem(path, show_note, self.on_image_selected, comment=self.index.comment(path),
+                                 query=self.query, parent=self.grid_widget)
             self.grid_layout.addWidget(item, row, col)
             self.grid_items[path] = item
             # if in-memory cache, set immediately
@@ -474,8 +466,9 @@ class MainWindow(QMainWindow):
 
     def on_comment_saved(self, image_path, comment):
         logger.debug(f"Comment saved for {image_path}: {comment}")
+        # write_comment swallows its errors, so take the comment from disk rather than the signal
+        self.index.update_comment(image_path, read_comment(image_path))
         show_note = self.notes_toggle.isChecked()
-        search_text = self.search_box.text().strip()
         item = self.grid_items.get(image_path)
         if item:
-                item.refresh_note(show_note, search_text)
+                item.refresh_note(show_note, self.index.comment(image_path), self.query)
@@ -0,0 +1,27 @@
+import piexif
+
+from core.metadata import _exif_date
+
+
+def test_exif_date_prefers_date_time_original():
+    exif_dict = {
+        "Exif": {piexif.ExifIFD.DateTimeOriginal: b"2024:05:12 10:30:00"},
+        "0th": {piexif.ImageIFD.DateTime: b"2024:06:01 08:00:00"},
+    }
+    assert _exif_date(exif_dict) == "2024-05-12"
+
+
+def test_exif_date_skips_placeholder_dates():
+    exif_dict = {
+        "Exif": {piexif.ExifIFD.DateTimeOriginal: b"0000:00:00 00:00:00"},
+        "0th": {piexif.ImageIFD.DateTime: b"2024:06:01 08:00:00"},
+    }
+    assert _exif_date(exif_dict) == "2024-06-01"
+
+
+def test_exif_date_all_zero_falls_back_to_empty():
+    exif_dict = {
+        "Exif": {piexif.ExifIFD.DateTimeOriginal: b"0000:00:00 00:00:00"},
+        "0th": {piexif.ImageIFD.DateTime: b"2024:13:45 00:00:00"},
+    }
+    assert _exif_date(exif_dict) == ""
@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from core.search import SearchIndex, QueryError, compile_query
+
+ROOT = os.path.join("photos")
+
+COMMENTS = {
+    os.path.join(ROOT, "a.jpg"): ("Black cat on the roof", "2024-03-15"),
+    os.path.join(ROOT, "b.png"): ("dog & cat <3", "2023-12-31"),
+    os.path.join(ROOT, "trips", "c.jpg"): ("", "2024-05-01"),
+    os.path.join(ROOT, "trips", "2024", "d.webp"): ("Sea view, black-and-white", "2024-05-20"),
+}
+
+
+def stub_reader(path):
+    return COMMENTS[path]
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(list(COMMENTS), root=ROOT, metadata_reader=stub_reader)
+
+
+def search(index, text):
+    return [os.path.basename(path) for path in compile_query(text).filter(index)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", ["a.jpg", "b.png", "c.jpg", "d.webp"]),
+    ("cat", ["a.jpg", "b.png"]),
+    ("CAT dog", ["b.png"]),
+    ("cat AND dog", ["b.png"]),
+    ("cat OR sea", ["a.jpg", "b.png", "d.webp"]),
+    ("NOT cat", ["c.jpg", "d.webp"]),
+    ("NOT NOT cat", ["a.jpg", "b.png"]),
+    ("-cat", ["c.jpg", "d.webp"]),
+    ("(cat OR sea) -ext:png", ["a.jpg", "d.webp"]),
+    ("cat or dog", []),
+])
+def test_boolean_operators(index, text, expected):
+    assert search(index, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('"black cat"', ["a.jpg"]),
+    ('"cat on the"', ["a.jpg"]),
+    ('"ack-and-wh"', ["d.webp"]),
+    ('"& cat"', ["b.png"]),
+    ('"cat roof"', []),
+    ('-"black cat"', ["b.png", "c.jpg", "d.webp"]),
+])
+def test_phrases(index, text, expected):
+    assert search(index, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("/b.a+ck/", ["a.jpg", "d.webp"]),
+    ("/^dog/", ["b.png"]),
+    ("/roof/ black", ["a.jpg"]),
+    ("cat -/roof/", ["b.png"]),
+])
+def test_regex(index, text, expected):
+    assert search(index, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ext:jpg", ["a.jpg", "c.jpg"]),
+    ("ext:.JPG -has:comment", ["c.jpg"]),
+    ("folder:trips", ["c.jpg", "d.webp"]),
+    ("folder:2024 OR ext:png", ["b.png", "d.webp"]),
+    ("has:comment", ["a.jpg", "b.png", "d.webp"]),
+    ("date:2024-05", ["c.jpg", "d.webp"]),
+    ("date:2024-01..2024-03", ["a.jpg"]),
+    ("date:..2023", ["b.png"]),
+    ("date:2024-03..2024", ["a.jpg", "c.jpg", "d.webp"]),
+    ("note:x", []),
+])
+def test_qualifiers(index, text, expected):
+    assert search(index, text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "cat AND", "(cat", "cat)", "/[/", "has:foo", "ext:",
+    "date:foo", "date:2024-5", "date:2024/05", "date:2024-03..2024-01", "date:..",
+])
+def test_invalid_queries(text):
+    with pytest.raises(QueryError):
+        compile_query(text)
+
+
+def test_update_comment_cleans_up_words(index):
+    path = os.path.join(ROOT, "a.jpg")
+    index.update_comment(path, "kitten")
+    assert "roof" not in index.by_word
+    assert index.by_word["black"] == {3}
+    assert search(index, "kitten") == ["a.jpg"]
+    assert search(index, "roof") == []
+    index.update_comment(path, "")
+    assert "kitten" not in index.by_word
+    assert search(index, "has:comment") == ["b.png", "d.webp"]
+
+
+def test_missing_exif_date_falls_back_to_mtime(tmp_path):
+    path = str(tmp_path / "e.jpg")
+    open(path, "wb").close()
+    os.utime(path, (1700000000, 1700000000))  # 2023-11-14
+    index = SearchIndex([path], root=str(tmp_path), metadata_reader=lambda p: ("", ""))
+    assert compile_query("date:2023-11").filter(index) == [path]
+
+    os.utime(path, (1715000000, 1715000000))  # 2024-05-06, as if the save rewrote the file
+    index.update_comment(path, "new")
+    assert compile_query("date:2023-11").filter(index) == []
+    assert compile_query("date:2024-05").filter(index) == [path]
+
+
+def test_highlight_escapes_html():
+    query = compile_query("cat OR /d.g/ -roof")
+    assert query.highlight("dog & cat <3 roof") == (
+        "<span style='background-color: #ffe066;'>dog</span> &amp; "
+        "<span style='background-color: #ffe066;'>cat</span> &lt;3 roof"
+    )
+    assert compile_query("").highlight("<b>") == "&lt;b&gt;"
+
+
+def test_highlight_keeps_regex_with_inline_flags():
+    assert compile_query("/(?i)cat/ dog").highlight("dog cat") == (
+        "<span style='background-color: #ffe066;'>dog</span> "
+        "<span style='background-color: #ffe066;'>cat</span>"
+    )
+
+
+def test_highlight_double_negation():
+    assert "span" in compile_query("NOT NOT cat").highlight("a cat")
+    assert "span" not in compile_query("NOT cat").highlight("a cat")